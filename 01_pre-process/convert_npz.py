@@ -0,0 +1,66 @@
+"""
+Convert JSONL embedding batches into binary .npz files for faster ingestion.
+
+Each data/converted/elasticsearch_batch_*.jsonl gets a sibling .npz holding:
+    emb  - (n, 384) float32 array of embeddings
+    meta - object array of per-document dicts (id, title, text,
+           chunk_index, text_length), stored with pickle
+
+Only the Pinecone ingest (02_ingest/ingest_pinecone.py) reads the .npz,
+instead of the JSONL, when USE_BINARY_FORMAT=1, skipping JSON parsing of
+the embeddings entirely. The Elasticsearch ingest always reads the JSONL.
+
+Usage:
+    python convert_npz.py
+"""
+
+from pathlib import Path
+import numpy as np
+import orjson
+
+EMBEDDING_DIM = 384
+INDEX_ACTION_PREFIX = b'{"index"'  # Bulk action lines in the batch files
+META_FIELDS = ("id", "title", "text", "chunk_index", "text_length")
+DATA_DIR = Path(__file__).parent.parent / "data" / "converted"
+
+
+def convert_batch(filepath: Path, npz_path: Path) -> int:
+    """Convert a single JSONL batch file to .npz. Returns document count."""
+    embeddings = []
+    metadata = []
+
+    with open(filepath, 'rb') as f:
+        for line in f:
+            if line.startswith(INDEX_ACTION_PREFIX):
+                continue
+
+            doc = orjson.loads(line)
+            embeddings.append(doc["embedding"])
+            metadata.append({field: doc[field] for field in META_FIELDS})
+
+    emb = np.asarray(embeddings, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+    meta = np.empty(len(metadata), dtype=object)
+    meta[:] = metadata
+    np.savez(npz_path, emb=emb, meta=meta)
+    return len(metadata)
+
+
+def main():
+    batch_files = sorted(DATA_DIR.glob("elasticsearch_batch_*.jsonl"))
+    print(f"Found {len(batch_files)} batch files")
+
+    converted = 0
+    for i, filepath in enumerate(batch_files):
+        npz_path = filepath.with_suffix(".npz")
+        if npz_path.exists() and npz_path.stat().st_mtime >= filepath.stat().st_mtime:
+            continue
+
+        count = convert_batch(filepath, npz_path)
+        converted += 1
+        print(f"[{i+1}/{len(batch_files)}] {filepath.name} -> {npz_path.name} ({count:,} docs)")
+
+    print(f"\nConverted {converted} batch files ({len(batch_files) - converted} already up to date)")
+
+
+if __name__ == "__main__":
+    main()
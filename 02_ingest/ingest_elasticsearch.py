@@ -2,19 +2,61 @@
 Bulk ingest pre-processed Wikipedia chunks into Elasticsearch Cloud.
 
 Usage:
-    python ingest_elasticsearch.py
+    python ingest_elasticsearch.py [--threads N] [--http2] [--raw | --quantize]
 
 Environment variables:
     ELASTICSEARCH_ENDPOINT - Elasticsearch Cloud endpoint URL
     ELASTICSEARCH_API_KEY - API key for authentication
     INDEX_NAME - Target index name
+    BULK_CHUNK_SIZE - Documents per bulk request (default: 500)
+    BULK_MAX_CHUNK_BYTES - Max bytes per bulk request (default: 10MB)
+    BULK_SWEEP - Set to 1 to grid-search the two settings above on the
+        first pending batch before ingesting
+
+With --quantize, a new index maps the embedding as an int8 ("byte")
+dense_vector and each embedding is scaled to [-127, 127] on the client
+before indexing. Cosine similarity ignores the per-vector scale, but
+query vectors must be quantized the same way to search such an index.
+An existing index must already have the matching element type: byte
+with --quantize, float without it.
+
+Refresh is disabled during ingestion and set to REFRESH_INTERVAL (60s)
+afterwards, with no forced refresh at the end. Newly indexed documents
+become searchable on the next scheduled refresh, up to a minute later,
+in exchange for far less refresh work than the default 1s interval.
 """
 
 import os
-import json
+import ssl
+import gzip
+import gc
+import sys
+import re
+import mmap
+import atexit
+import argparse
+import time
+import itertools
 from pathlib import Path
+from typing import NamedTuple, TextIO
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import orjson
+import certifi
+import httpx
+from elastic_transport import (
+    ApiResponseMeta,
+    BaseNode,
+    ConnectionError as TransportConnectionError,
+    ConnectionTimeout,
+    HttpHeaders,
+    NodeConfig,
+)
+from elastic_transport.client_utils import DEFAULT, client_meta_version
 from elasticsearch import Elasticsearch
-from elasticsearch.helpers import parallel_bulk
+from elasticsearch.helpers import parallel_bulk, streaming_bulk
+from elasticsearch.serializer import OrjsonSerializer
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -23,28 +65,183 @@ ELASTICSEARCH_ENDPOINT = os.getenv("ELASTICSEARCH_ENDPOINT")
 ELASTICSEARCH_API_KEY = os.getenv("ELASTICSEARCH_API_KEY")
 INDEX_NAME = os.getenv("INDEX_NAME").lower()
 
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "500"))
+BULK_MAX_CHUNK_BYTES = int(os.getenv("BULK_MAX_CHUNK_BYTES", str(10 * 1024 * 1024)))
+BULK_SWEEP = os.getenv("BULK_SWEEP") == "1"
+DEFAULT_THREAD_COUNT = min(8, os.cpu_count() or 1)
+HTTP2_THREAD_COUNT = 16  # HTTP/2 streams are cheap, so more bulks can be in flight
+
 EMBEDDING_DIM = 384
+REFRESH_INTERVAL = "60s"  # Applied once ingestion finishes
+SWEEP_CHUNK_SIZES = [200, 500, 1000, 2000]
+SWEEP_MAX_CHUNK_BYTES = [mb * 1024 * 1024 for mb in (5, 10, 50)]
+INDEX_ACTION_PREFIX = b'{"index"'  # Bulk action lines in the batch files
+INDEX_NAME_FIELD = re.compile(rb'("_index"\s*:\s*)"[^"]*"')
+ACTION_ID_FIELD = re.compile(rb'"_id"\s*:\s*"[^"]+"')
+GC_THRESHOLD = (100_000, 50, 50)  # Default is (700, 10, 10)
+SWITCH_INTERVAL = 0.05  # Seconds; default is 0.005
 DATA_DIR = Path(__file__).parent.parent / "data" / "converted"
+PROGRESS_FLUSH_EVERY = 8  # Completed batches between progress file flushes
+BATCH_INDEX_PATTERN = re.compile(r"elasticsearch_batch_(\d+)\.jsonl$")
 PROGRESS_FILE = Path(__file__).parent / "ingest_elasticsearch_done.txt"
 
 
-def load_completed_batches() -> set[str]:
-    """Load set of already completed batch filenames."""
-    if not PROGRESS_FILE.exists():
-        return set()
-    return set(PROGRESS_FILE.read_text().strip().split("\n"))
-
+def batch_index(filename: str) -> int:
+    """Extract the numeric index from a batch filename, e.g. 123 for elasticsearch_batch_000123.jsonl."""
+    match = BATCH_INDEX_PATTERN.search(filename)
+    if match is None:
+        raise ValueError(f"Not a batch filename: {filename!r}")
+    return int(match.group(1))
 
-def mark_batch_complete(filename: str):
-    """Append completed batch filename to progress file."""
-    with open(PROGRESS_FILE, "a") as f:
-        f.write(f"{filename}\n")
 
+def load_completed_batches(num_batches: int) -> np.ndarray:
+    """Load a bitmap of completed batches, indexed by batch index.
 
-def create_or_prepare_index(client: Elasticsearch):
-    """Create index or prepare existing index for bulk ingestion."""
+    The progress file holds one batch index per line; filenames written by
+    older runs are still understood.
+    """
+    done = np.zeros(num_batches, dtype=bool)
+    if not PROGRESS_FILE.exists():
+        return done
+
+    for entry in PROGRESS_FILE.read_text().split():
+        try:
+            index = int(entry) if entry.isdigit() else batch_index(entry)
+        except ValueError:
+            raise ValueError(f"Unrecognised entry {entry!r} in {PROGRESS_FILE}") from None
+        if index < num_batches:
+            done[index] = True
+    return done
+
+
+def open_progress_file() -> TextIO:
+    """Open the progress file for appending; it is flushed and closed at exit."""
+    progress_file = open(PROGRESS_FILE, "a")
+    atexit.register(progress_file.close)
+    return progress_file
+
+
+def mark_batch_complete(progress_file: TextIO, done: np.ndarray, index: int, completed_count: int):
+    """Mark a batch done and append its index, flushing every PROGRESS_FLUSH_EVERY batches."""
+    done[index] = True
+    progress_file.write(f"{index}\n")
+    if completed_count % PROGRESS_FLUSH_EVERY == 0:
+        progress_file.flush()
+
+
+class Http2Response(NamedTuple):
+    """Response returned by Http2Node, shaped like the transport's own node responses."""
+    meta: ApiResponseMeta
+    body: bytes
+
+
+class Http2Node(BaseNode):
+    """Transport node that sends requests over HTTP/2 using httpx.
+
+    All bulk threads are multiplexed as streams over one connection instead
+    of each pooled urllib3 connection paying its own TCP+TLS handshake.
+    """
+
+    _CLIENT_META_HTTP_CLIENT = ("hx", client_meta_version(httpx.__version__))
+
+    def __init__(self, config: NodeConfig):
+        super().__init__(config)
+        if config.ssl_assert_fingerprint:
+            raise ValueError("Http2Node does not support ssl_assert_fingerprint")
+
+        # Connection-specific headers are not allowed in HTTP/2
+        self.headers.pop("connection", None)
+        self.client = httpx.Client(
+            base_url=self.base_url,
+            http2=True,
+            limits=httpx.Limits(max_connections=config.connections_per_node),
+            timeout=config.request_timeout,
+            verify=self._ssl_context(config) if config.scheme == "https" else False
+        )
+
+    @staticmethod
+    def _ssl_context(config: NodeConfig) -> ssl.SSLContext:
+        """Build the TLS context from the node's ssl_context, verify_certs,
+        ca_certs, ssl_version and client_cert/client_key options."""
+        if config.ssl_context is not None:
+            return config.ssl_context
+
+        ca_certs = certifi.where() if config.ca_certs is None else config.ca_certs
+        if os.path.isfile(ca_certs):
+            ssl_context = ssl.create_default_context(cafile=ca_certs)
+        elif os.path.isdir(ca_certs):
+            ssl_context = ssl.create_default_context(capath=ca_certs)
+        else:
+            raise ValueError("ca_certs parameter is not a path")
+
+        if not config.verify_certs:
+            ssl_context.check_hostname = False
+            ssl_context.verify_mode = ssl.CERT_NONE
+
+        ssl_version = config.ssl_version or ssl.TLSVersion.TLSv1_2
+        if not isinstance(ssl_version, ssl.TLSVersion):
+            raise ValueError("Http2Node only supports 'ssl.TLSVersion.TLSvX' values for ssl_version")
+        ssl_context.minimum_version = ssl_version
+
+        if config.client_cert:
+            ssl_context.load_cert_chain(config.client_cert, config.client_key)
+        return ssl_context
+
+    def perform_request(self, method, target, body=None, headers=None, request_timeout=DEFAULT):
+        request_headers = self.headers.copy()
+        if headers:
+            request_headers.update(headers)
+        if body and self._http_compress:
+            body = gzip.compress(body)
+            request_headers["content-encoding"] = "gzip"
+
+        timeout = self.config.request_timeout if request_timeout is DEFAULT else request_timeout
+        start = time.perf_counter()
+        try:
+            resp = self.client.request(
+                method,
+                target,
+                content=body,
+                headers=dict(request_headers),
+                timeout=timeout
+            )
+        except httpx.TimeoutException as e:
+            raise ConnectionTimeout("Connection timed out during request", errors=(e,)) from e
+        except httpx.TransportError as e:
+            raise TransportConnectionError(str(e), errors=(e,)) from e
+
+        meta = ApiResponseMeta(
+            resp.status_code,
+            resp.http_version.removeprefix("HTTP/"),
+            HttpHeaders(resp.headers),
+            time.perf_counter() - start,
+            self.config
+        )
+        return Http2Response(meta, resp.content)
+
+    def close(self):
+        self.client.close()
+
+
+def create_or_prepare_index(client: Elasticsearch, quantize: bool = False):
+    """Create index or prepare existing index for bulk ingestion.
+
+    An existing index must map the embedding with the element type that
+    matches `quantize`, otherwise every document would be rejected.
+    """
     if client.indices.exists(index=INDEX_NAME):
         print(f"Index '{INDEX_NAME}' already exists")
+        # Keyed by the concrete index name, which differs if INDEX_NAME is an alias
+        mapping = next(iter(client.indices.get_mapping(index=INDEX_NAME).body.values()))["mappings"]
+        embedding = mapping.get("properties", {}).get("embedding", {})
+        element_type = embedding.get("element_type", "float")
+        expected_type = "byte" if quantize else "float"
+        if element_type != expected_type:
+            raise ValueError(
+                f"Index '{INDEX_NAME}' maps the embedding as '{element_type}' vectors, "
+                f"but this run sends '{expected_type}' vectors; "
+                "use a new index or match --quantize to the existing mapping"
+            )
         # Disable refresh and replicas for faster ingestion
         print("Disabling refresh and replicas for ingestion...")
         client.indices.put_settings(index=INDEX_NAME, body={
@@ -76,56 +273,266 @@ def create_or_prepare_index(client: Elasticsearch):
             }
         }
     }
+    if quantize:
+        mappings["mappings"]["properties"]["embedding"]["element_type"] = "byte"
 
     client.indices.create(index=INDEX_NAME, body=mappings)
     print(f"Created index '{INDEX_NAME}' (refresh disabled, 0 replicas)")
 
 
-def generate_actions_for_batch(filepath: Path):
+def iter_lines(filepath: Path):
+    """Yield the lines of a file as bytes by scanning an mmap for newlines.
+
+    Avoids the readline machinery of regular file iteration; the slices can
+    be passed straight to orjson.loads.
+    """
+    with open(filepath, 'rb') as f:
+        # mmap cannot map an empty file
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            size = len(mm)
+            pos = 0
+            while pos < size:
+                newline = mm.find(b"\n", pos)
+                if newline == -1:
+                    newline = size
+                yield mm[pos:newline]
+                pos = newline + 1
+
+
+def quantize_embedding(vector: np.ndarray) -> np.ndarray:
+    """Scale an embedding by its max magnitude into int8 values for a byte dense_vector."""
+    max_abs = np.abs(vector).max()
+    if max_abs == 0:
+        return np.zeros(len(vector), dtype=np.int8)
+    return np.clip(np.round(vector / max_abs * 127), -128, 127).astype(np.int8)
+
+
+def generate_actions_for_batch(filepath: Path, quantize: bool = False):
     """Generate bulk actions from a single JSONL batch file."""
-    with open(filepath, 'r') as f:
-        for line in f:
-            doc = json.loads(line)
-
-            # Skip index action lines (they have "index" key)
-            if "index" in doc:
-                continue
-
-            yield {
-                "_index": INDEX_NAME,
-                "_id": doc["id"],
-                "_source": doc
-            }
+    for line in iter_lines(filepath):
+        # Skip index action lines without parsing them
+        if line.startswith(INDEX_ACTION_PREFIX):
+            continue
+
+        doc = orjson.loads(line)
+        # Contiguous arrays are written by orjson's numpy path in one C loop
+        doc["embedding"] = np.asarray(doc["embedding"], dtype=np.float32)
+        if quantize:
+            doc["embedding"] = quantize_embedding(doc["embedding"])
+
+        yield {
+            "_index": INDEX_NAME,
+            "_id": doc["id"],
+            "_source": doc
+        }
+
+
+def load_actions_for_batch(filepath: Path, quantize: bool = False) -> list[dict]:
+    """Parse a whole batch file into bulk actions so it can be prefetched."""
+    return list(generate_actions_for_batch(filepath, quantize))
+
+
+def generate_raw_bulk_bodies(filepath: Path, max_chunk_bytes: int):
+    """Yield NDJSON bulk bodies taken straight from a batch file's bytes.
+
+    The file is already in bulk format, so only the _index of each action
+    line is rewritten to INDEX_NAME; document lines are forwarded without
+    being parsed. The _id of each action line is trusted to be the id of
+    the document that follows it, as written by the batch export, and a
+    ValueError is raised for an action line without one. Bodies are only
+    cut before an action line, once they reach max_chunk_bytes.
+    """
+    index_field = rb'\1"' + INDEX_NAME.encode() + b'"'
+    body = bytearray()
+
+    for line_number, line in enumerate(iter_lines(filepath), start=1):
+        if line.startswith(INDEX_ACTION_PREFIX):
+            if not ACTION_ID_FIELD.search(line):
+                raise ValueError(f"{filepath.name}:{line_number}: bulk action line has no _id")
+            if len(body) >= max_chunk_bytes:
+                yield bytes(body)
+                body.clear()
+            line = INDEX_NAME_FIELD.sub(index_field, line)
+
+        body += line
+        body += b"\n"
+
+    if body:
+        yield bytes(body)
+
+
+def load_raw_bodies_for_batch(filepath: Path, max_chunk_bytes: int) -> list[bytes]:
+    """Read a whole batch file into raw bulk bodies so it can be prefetched."""
+    return list(generate_raw_bulk_bodies(filepath, max_chunk_bytes))
 
 
-def ingest_batch(client: Elasticsearch, filepath: Path) -> tuple[int, int]:
-    """Ingest a single batch file. Returns (success_count, error_count)."""
+def ingest_raw_batch(
+    client: Elasticsearch,
+    bodies: list[bytes],
+    thread_count: int = DEFAULT_THREAD_COUNT
+) -> tuple[int, int]:
+    """Send raw bulk bodies of a single batch file. Returns (success_count, error_count)."""
     success_count = 0
     error_count = 0
 
-    for ok, result in parallel_bulk(
-        client,
-        generate_actions_for_batch(filepath),
-        chunk_size=1000,
-        thread_count=1,
-        raise_on_error=False
-    ):
-        if ok:
-            success_count += 1
-        else:
+    def send(body: bytes):
+        # Actions without an _index fall back to the index in the URL
+        return client.bulk(operations=body, index=INDEX_NAME)
+
+    with ThreadPoolExecutor(max_workers=thread_count) as pool:
+        for resp in pool.map(send, bodies):
+            for item in resp["items"]:
+                result = item["index"]
+                if "error" in result:
+                    error_count += 1
+                    print(f"Error: {result}")
+                else:
+                    success_count += 1
+
+    return success_count, error_count
+
+
+def ingest_batch(
+    client: Elasticsearch,
+    actions: list[dict],
+    chunk_size: int = BULK_CHUNK_SIZE,
+    max_chunk_bytes: int = BULK_MAX_CHUNK_BYTES,
+    thread_count: int = DEFAULT_THREAD_COUNT
+) -> tuple[int, int]:
+    """Ingest the actions of a single batch file. Returns (success_count, error_count).
+
+    With a single thread, streaming_bulk is used instead of parallel_bulk to
+    skip the thread pool and its queue, which only add overhead when the
+    client is CPU-bound. Only that path can suppress successes (yield_ok=False);
+    parallel_bulk yields a result for every document.
+    """
+    if thread_count == 1:
+        results = streaming_bulk(
+            client,
+            actions,
+            chunk_size=chunk_size,
+            max_chunk_bytes=max_chunk_bytes,
+            yield_ok=False,
+            raise_on_error=False
+        )
+    else:
+        results = parallel_bulk(
+            client,
+            actions,
+            chunk_size=chunk_size,
+            max_chunk_bytes=max_chunk_bytes,
+            thread_count=thread_count,
+            queue_size=thread_count * 2,
+            raise_on_error=False
+        )
+
+    error_count = 0
+    for ok, result in results:
+        if not ok:
             error_count += 1
             print(f"Error: {result}")
 
-    return success_count, error_count
+    return len(actions) - error_count, error_count
+
+
+def sweep_bulk_settings(
+    client: Elasticsearch,
+    filepath: Path,
+    thread_count: int,
+    quantize: bool = False
+) -> tuple[int, int]:
+    """Time every chunk_size/max_chunk_bytes combination on one batch file.
+
+    Documents keep their IDs, so repeated runs overwrite rather than duplicate.
+    Returns the fastest (chunk_size, max_chunk_bytes).
+    """
+    print(f"Sweeping bulk settings on {filepath.name}...")
+    actions = load_actions_for_batch(filepath, quantize)
+    results = []
+
+    for chunk_size, max_chunk_bytes in itertools.product(SWEEP_CHUNK_SIZES, SWEEP_MAX_CHUNK_BYTES):
+        start = time.perf_counter()
+        success, _ = ingest_batch(client, actions, chunk_size, max_chunk_bytes, thread_count)
+        docs_per_sec = success / (time.perf_counter() - start)
+        results.append((docs_per_sec, chunk_size, max_chunk_bytes))
+        print(f"  chunk_size={chunk_size}, max_chunk_bytes={max_chunk_bytes // (1024 * 1024)}MB "
+              f"-> {docs_per_sec:,.0f} docs/sec")
+
+    docs_per_sec, chunk_size, max_chunk_bytes = max(results)
+    print(f"Best: chunk_size={chunk_size}, max_chunk_bytes={max_chunk_bytes // (1024 * 1024)}MB "
+          f"({docs_per_sec:,.0f} docs/sec)")
+    return chunk_size, max_chunk_bytes
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Bulk ingest batch files into Elasticsearch")
+    parser.add_argument(
+        "--threads",
+        type=int,
+        help=f"Concurrent bulk requests per batch file; 1 uses streaming_bulk "
+             f"(default: {DEFAULT_THREAD_COUNT}, or {HTTP2_THREAD_COUNT} with --http2)"
+    )
+    parser.add_argument(
+        "--http2",
+        action="store_true",
+        help="Multiplex bulk requests over a single HTTP/2 connection using httpx"
+    )
+    parser.add_argument(
+        "--raw",
+        action="store_true",
+        help="Forward the batch files' bulk lines to _bulk as-is instead of "
+             "parsing documents and using the bulk helpers"
+    )
+    parser.add_argument(
+        "--quantize",
+        action="store_true",
+        help="Index embeddings as int8 (byte) vectors; an existing index must "
+             "already map the embedding as byte"
+    )
+    args = parser.parse_args()
+    if args.raw and args.quantize:
+        parser.error("--quantize needs parsed documents and cannot be combined with --raw")
+    if args.threads is None:
+        args.threads = HTTP2_THREAD_COUNT if args.http2 else DEFAULT_THREAD_COUNT
+    return args
+
+
+def configure_runtime():
+    """Tune the interpreter for ingestion.
+
+    Parsing allocates a dict per document, which otherwise triggers a
+    generation-0 collection every 700 allocations; the longer switch
+    interval cuts GIL handoffs between the parsing and upload threads.
+    """
+    gc.set_threshold(*GC_THRESHOLD)
+    sys.setswitchinterval(SWITCH_INTERVAL)
 
 
 def main():
+    args = parse_args()
+    configure_runtime()
+
     if not all([ELASTICSEARCH_ENDPOINT, ELASTICSEARCH_API_KEY, INDEX_NAME]):
         raise ValueError("Missing required environment variables")
 
+    client_options = {}
+    if args.http2:
+        client_options["node_class"] = Http2Node
+
     client = Elasticsearch(
         ELASTICSEARCH_ENDPOINT,
-        api_key=ELASTICSEARCH_API_KEY
+        api_key=ELASTICSEARCH_API_KEY,
+        # orjson (with OPT_SERIALIZE_NUMPY) encodes the numpy embeddings natively
+        serializer=OrjsonSerializer(),
+        # Dense-vector JSON compresses well, and bulk threads share this pool
+        http_compress=True,
+        connections_per_node=32,
+        request_timeout=120,
+        retry_on_timeout=True,
+        **client_options
     )
 
     # Verify connection
@@ -133,50 +540,82 @@ def main():
     print(f"Connected to Elasticsearch: {info['version']['number']}")
 
     # Create or prepare index
-    create_or_prepare_index(client)
+    create_or_prepare_index(client, args.quantize)
 
     # Get batch files and filter out completed ones
-    all_batch_files = sorted(DATA_DIR.glob("elasticsearch_batch_*.jsonl"))
-    completed = load_completed_batches()
-    batch_files = [f for f in all_batch_files if f.name not in completed]
+    all_batch_files = sorted(
+        f for f in DATA_DIR.glob("elasticsearch_batch_*.jsonl") if BATCH_INDEX_PATTERN.search(f.name)
+    )
+    num_batches = max((batch_index(f.name) for f in all_batch_files), default=-1) + 1
+    done = load_completed_batches(num_batches)
+    batch_files = [f for f in all_batch_files if not done[batch_index(f.name)]]
 
     print(f"Found {len(all_batch_files)} total batch files")
-    print(f"Skipping {len(completed)} already completed batches")
+    print(f"Skipping {len(all_batch_files) - len(batch_files)} already completed batches")
     print(f"Processing {len(batch_files)} remaining batches")
 
     if not batch_files:
         print("Nothing to ingest!")
         return
 
+    chunk_size, max_chunk_bytes = BULK_CHUNK_SIZE, BULK_MAX_CHUNK_BYTES
+    if BULK_SWEEP and not args.raw:
+        chunk_size, max_chunk_bytes = sweep_bulk_settings(
+            client, batch_files[0], args.threads, args.quantize
+        )
+
     # Ingest each batch and track progress
     total_success = 0
     total_errors = 0
-
-    for i, filepath in enumerate(batch_files):
-        print(f"[{i+1}/{len(batch_files)}] Processing {filepath.name}")
-
-        success, errors = ingest_batch(client, filepath)
-        total_success += success
-        total_errors += errors
-
-        # Mark batch as complete
-        mark_batch_complete(filepath.name)
-        print(f"  -> {success:,} docs indexed, {errors} errors")
+    progress_file = open_progress_file()
+
+    if args.raw:
+        load_batch = partial(load_raw_bodies_for_batch, max_chunk_bytes=max_chunk_bytes)
+        send_batch = partial(ingest_raw_batch, client, thread_count=args.threads)
+    else:
+        load_batch = partial(load_actions_for_batch, quantize=args.quantize)
+        send_batch = partial(
+            ingest_batch,
+            client,
+            chunk_size=chunk_size,
+            max_chunk_bytes=max_chunk_bytes,
+            thread_count=args.threads
+        )
+
+    # Read the next batch file in the background while the current one is sent
+    with ThreadPoolExecutor(max_workers=1) as prefetcher:
+        next_batch = prefetcher.submit(load_batch, batch_files[0])
+
+        for i, filepath in enumerate(batch_files):
+            print(f"[{i+1}/{len(batch_files)}] Processing {filepath.name}")
+
+            batch = next_batch.result()
+            if i + 1 < len(batch_files):
+                next_batch = prefetcher.submit(load_batch, batch_files[i + 1])
+
+            success, errors = send_batch(batch)
+            total_success += success
+            total_errors += errors
+
+            # Mark batch as complete
+            mark_batch_complete(progress_file, done, batch_index(filepath.name), i + 1)
+            print(f"  -> {success:,} docs indexed, {errors} errors")
+
+    progress_file.close()
 
     print(f"\nIngestion complete: {total_success:,} documents indexed")
     if total_errors:
         print(f"Total errors: {total_errors:,}")
 
-    # Restore normal settings
+    # Re-enable replicas and a relaxed periodic refresh
     print("Restoring index settings...")
     client.indices.put_settings(index=INDEX_NAME, body={
         "index": {
-            "refresh_interval": "1s",
+            "refresh_interval": REFRESH_INTERVAL,
             "number_of_replicas": 1
         }
     })
-    client.indices.refresh(index=INDEX_NAME)
-    print("Index settings restored and refreshed")
+    print(f"Index settings restored (refresh every {REFRESH_INTERVAL})")
 
 
 if __name__ == "__main__":
@@ -7,41 +7,91 @@ Usage:
 Environment variables:
     PINECONE_API_KEY - Pinecone API key
     PINECONE_INDEX_NAME - Target index name
+    USE_BINARY_FORMAT - Set to 1 to read embeddings from the .npz written
+        next to each batch by 01_pre-process/convert_npz.py; batches without
+        an .npz, or whose .npz is older than the JSONL, fall back to the JSONL
 """
 
 import os
-import json
+import gc
+import sys
+import re
+import mmap
+import atexit
 import hashlib
 from pathlib import Path
-from pinecone import Pinecone
+from typing import TextIO
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+import orjson
+from pinecone.grpc import PineconeGRPC
 from dotenv import load_dotenv
 
 load_dotenv()
 
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
+USE_BINARY_FORMAT = os.getenv("USE_BINARY_FORMAT") == "1"
 
 EMBEDDING_DIM = 384
 BATCH_SIZE = 100  # Pinecone recommends 100 vectors per upsert
 MAX_VECTORS = 10_000  # Limit total vectors to ingest
+INGEST_WORKERS = 4  # Batch files upserted concurrently
+MAX_IN_FLIGHT_UPSERTS = 20  # Outstanding async upserts per batch file
+INDEX_ACTION_PREFIX = b'{"index"'  # Bulk action lines in the batch files
+GC_THRESHOLD = (100_000, 50, 50)  # Default is (700, 10, 10)
+SWITCH_INTERVAL = 0.05  # Seconds; default is 0.005
 DATA_DIR = Path(__file__).parent.parent / "data" / "converted"
+PROGRESS_FLUSH_EVERY = 8  # Completed batches between progress file flushes
+BATCH_INDEX_PATTERN = re.compile(r"elasticsearch_batch_(\d+)\.jsonl$")
 PROGRESS_FILE = Path(__file__).parent / "ingest_pinecone_done.txt"
 
 
-def load_completed_batches() -> set[str]:
-    """Load set of already completed batch filenames."""
+def batch_index(filename: str) -> int:
+    """Extract the numeric index from a batch filename, e.g. 123 for elasticsearch_batch_000123.jsonl."""
+    match = BATCH_INDEX_PATTERN.search(filename)
+    if match is None:
+        raise ValueError(f"Not a batch filename: {filename!r}")
+    return int(match.group(1))
+
+
+def load_completed_batches(num_batches: int) -> np.ndarray:
+    """Load a bitmap of completed batches, indexed by batch index.
+
+    The progress file holds one batch index per line; filenames written by
+    older runs are still understood.
+    """
+    done = np.zeros(num_batches, dtype=bool)
     if not PROGRESS_FILE.exists():
-        return set()
-    return set(PROGRESS_FILE.read_text().strip().split("\n"))
+        return done
+
+    for entry in PROGRESS_FILE.read_text().split():
+        try:
+            index = int(entry) if entry.isdigit() else batch_index(entry)
+        except ValueError:
+            raise ValueError(f"Unrecognised entry {entry!r} in {PROGRESS_FILE}") from None
+        if index < num_batches:
+            done[index] = True
+    return done
+
+
+def open_progress_file() -> TextIO:
+    """Open the progress file for appending; it is flushed and closed at exit."""
+    progress_file = open(PROGRESS_FILE, "a")
+    atexit.register(progress_file.close)
+    return progress_file
 
 
-def mark_batch_complete(filename: str):
-    """Append completed batch filename to progress file."""
-    with open(PROGRESS_FILE, "a") as f:
-        f.write(f"{filename}\n")
+def mark_batch_complete(progress_file: TextIO, done: np.ndarray, index: int, completed_count: int):
+    """Mark a batch done and append its index, flushing every PROGRESS_FLUSH_EVERY batches."""
+    done[index] = True
+    progress_file.write(f"{index}\n")
+    if completed_count % PROGRESS_FLUSH_EVERY == 0:
+        progress_file.flush()
 
 
-def create_index_if_not_exists(pc: Pinecone):
+def create_index_if_not_exists(pc: PineconeGRPC):
     """Create index if it doesn't exist."""
     existing_indexes = [idx.name for idx in pc.list_indexes()]
 
@@ -65,67 +115,172 @@ def create_index_if_not_exists(pc: Pinecone):
 
 def sanitize_id(doc_id: str) -> str:
     """Convert ID to ASCII-safe format using hash if needed."""
-    # Try ASCII encoding - if it fails, use hash
-    try:
-        doc_id.encode('ascii')
+    if doc_id.isascii():
         return doc_id
-    except UnicodeEncodeError:
-        # Use hash for non-ASCII IDs
-        hash_hex = hashlib.md5(doc_id.encode('utf-8')).hexdigest()
-        return f"doc_{hash_hex}"
-
-
-def load_vectors_from_batch(filepath: Path) -> list[dict]:
-    """Load vectors from a single JSONL batch file."""
-    vectors = []
-
-    with open(filepath, 'r') as f:
-        for line in f:
-            doc = json.loads(line)
-
-            # Skip index action lines (they have "index" key)
-            if "index" in doc:
-                continue
-
-            vectors.append({
-                "id": sanitize_id(doc["id"]),
-                "values": doc["embedding"],
-                "metadata": {
-                    "title": doc["title"],
-                    "text": doc["text"],
-                    "chunk_index": doc["chunk_index"],
-                    "text_length": doc["text_length"],
-                    "original_id": doc["id"]  # Keep original for reference
-                }
-            })
-
-    return vectors
+    # Use hash for non-ASCII IDs
+    hash_hex = hashlib.md5(doc_id.encode('utf-8'), usedforsecurity=False).hexdigest()
+    return f"doc_{hash_hex}"
+
+
+def iter_lines(filepath: Path):
+    """Yield the lines of a file as bytes by scanning an mmap for newlines.
+
+    Avoids the readline machinery of regular file iteration; the slices can
+    be passed straight to orjson.loads.
+    """
+    with open(filepath, 'rb') as f:
+        # mmap cannot map an empty file
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            size = len(mm)
+            pos = 0
+            while pos < size:
+                newline = mm.find(b"\n", pos)
+                if newline == -1:
+                    newline = size
+                yield mm[pos:newline]
+                pos = newline + 1
+
+
+def build_metadata(doc: dict) -> dict:
+    """Pinecone metadata for a document."""
+    return {
+        "title": doc["title"],
+        "text": doc["text"],
+        "chunk_index": doc["chunk_index"],
+        "text_length": doc["text_length"],
+        "original_id": doc["id"]  # Keep original for reference
+    }
+
+
+def build_upsert_batch(ids: list[str], embeddings: np.ndarray, metadata: list[dict]) -> list[dict]:
+    """Zip staged ids, embeddings and metadata into Pinecone upsert dicts."""
+    return [
+        {"id": doc_id, "values": values, "metadata": meta}
+        for doc_id, values, meta in zip(ids, embeddings[:len(ids)].tolist(), metadata)
+    ]
+
+
+def iter_vector_batches(filepath: Path):
+    """Yield upsert-ready batches of up to BATCH_SIZE vectors from a JSONL batch file.
+
+    Embeddings are staged in a reused (BATCH_SIZE, EMBEDDING_DIM) float32
+    buffer and converted to lists only when a batch is emitted, so the file
+    is never held in memory as a whole.
+    """
+    embeddings = np.empty((BATCH_SIZE, EMBEDDING_DIM), dtype=np.float32)
+    ids = []
+    metadata = []
+
+    for line in iter_lines(filepath):
+        # Skip index action lines without parsing them
+        if line.startswith(INDEX_ACTION_PREFIX):
+            continue
+
+        doc = orjson.loads(line)
+
+        embeddings[len(ids)] = doc["embedding"]
+        ids.append(sanitize_id(doc["id"]))
+        metadata.append(build_metadata(doc))
+
+        if len(ids) == BATCH_SIZE:
+            yield build_upsert_batch(ids, embeddings, metadata)
+            ids.clear()
+            metadata.clear()
+
+    if ids:
+        yield build_upsert_batch(ids, embeddings, metadata)
+
+
+def iter_npz_vector_batches(npz_path: Path):
+    """Yield upsert-ready batches of up to BATCH_SIZE vectors from a converted .npz batch.
+
+    Embeddings are read straight into a float32 array, so no JSON is parsed.
+    """
+    with np.load(npz_path, allow_pickle=True) as data:
+        embeddings = data["emb"]
+        docs = data["meta"]
+
+    for start in range(0, len(docs), BATCH_SIZE):
+        batch_docs = docs[start:start + BATCH_SIZE]
+        yield build_upsert_batch(
+            [sanitize_id(doc["id"]) for doc in batch_docs],
+            embeddings[start:start + BATCH_SIZE],
+            [build_metadata(doc) for doc in batch_docs]
+        )
+
+
+def iter_batch_file(filepath: Path):
+    """Yield upsert batches for a batch file, preferring an up-to-date .npz when enabled."""
+    npz_path = filepath.with_suffix(".npz")
+    if USE_BINARY_FORMAT and npz_path.exists():
+        if npz_path.stat().st_mtime >= filepath.stat().st_mtime:
+            return iter_npz_vector_batches(npz_path)
+        print(f"  Warning: {npz_path.name} is older than {filepath.name}, reading the JSONL instead")
+    return iter_vector_batches(filepath)
+
+
+def count_vectors(filepath: Path) -> int:
+    """Count the documents in a JSONL batch file without parsing them."""
+    return sum(1 for line in iter_lines(filepath) if not line.startswith(INDEX_ACTION_PREFIX))
+
+
+def wait_for_upsert(future, batch_len: int) -> tuple[int, int]:
+    """Wait for an async upsert to finish. Returns (success_count, error_count)."""
+    try:
+        future.result()
+        return batch_len, 0
+    except Exception as e:
+        print(f"Error: {e}")
+        return 0, batch_len
 
 
 def ingest_batch(index, filepath: Path) -> tuple[int, int]:
     """Ingest a single batch file. Returns (success_count, error_count)."""
-    vectors = load_vectors_from_batch(filepath)
     success_count = 0
     error_count = 0
+    in_flight = deque()
+
+    # Pipeline async upserts, keeping at most MAX_IN_FLIGHT_UPSERTS outstanding
+    for batch in iter_batch_file(filepath):
+        if len(in_flight) >= MAX_IN_FLIGHT_UPSERTS:
+            success, errors = wait_for_upsert(*in_flight.popleft())
+            success_count += success
+            error_count += errors
 
-    # Upsert in smaller batches
-    for i in range(0, len(vectors), BATCH_SIZE):
-        batch = vectors[i:i + BATCH_SIZE]
         try:
-            index.upsert(vectors=batch)
-            success_count += len(batch)
+            in_flight.append((index.upsert(vectors=batch, async_req=True), len(batch)))
         except Exception as e:
             error_count += len(batch)
             print(f"Error: {e}")
 
+    while in_flight:
+        success, errors = wait_for_upsert(*in_flight.popleft())
+        success_count += success
+        error_count += errors
+
     return success_count, error_count
 
 
+def configure_runtime():
+    """Raise the GC threshold and GIL switch interval for the ingest run.
+
+    Each vector builds several short-lived dicts and lists, and the upload
+    workers would otherwise contend for the GIL every 5ms.
+    """
+    gc.set_threshold(*GC_THRESHOLD)
+    sys.setswitchinterval(SWITCH_INTERVAL)
+
+
 def main():
+    configure_runtime()
+
     if not all([PINECONE_API_KEY, PINECONE_INDEX_NAME]):
         raise ValueError("Missing required environment variables")
 
-    pc = Pinecone(api_key=PINECONE_API_KEY)
+    pc = PineconeGRPC(api_key=PINECONE_API_KEY)
 
     # Create index if needed
     create_index_if_not_exists(pc)
@@ -147,12 +302,15 @@ def main():
     print(f"Will add up to {remaining_capacity:,} more vectors to reach limit of {MAX_VECTORS:,}")
 
     # Get batch files and filter out completed ones
-    all_batch_files = sorted(DATA_DIR.glob("elasticsearch_batch_*.jsonl"))
-    completed = load_completed_batches()
-    batch_files = [f for f in all_batch_files if f.name not in completed]
+    all_batch_files = sorted(
+        f for f in DATA_DIR.glob("elasticsearch_batch_*.jsonl") if BATCH_INDEX_PATTERN.search(f.name)
+    )
+    num_batches = max((batch_index(f.name) for f in all_batch_files), default=-1) + 1
+    done = load_completed_batches(num_batches)
+    batch_files = [f for f in all_batch_files if not done[batch_index(f.name)]]
 
     print(f"Found {len(all_batch_files)} total batch files")
-    print(f"Skipping {len(completed)} already completed batches")
+    print(f"Skipping {len(all_batch_files) - len(batch_files)} already completed batches")
     print(f"Processing {len(batch_files)} remaining batches")
 
     if not batch_files:
@@ -162,22 +320,51 @@ def main():
     # Ingest each batch and track progress
     total_success = 0
     total_errors = 0
-
-    for i, filepath in enumerate(batch_files):
-        # Check if we've reached the limit
-        if current_count + total_success >= MAX_VECTORS:
-            print(f"\nReached limit of {MAX_VECTORS:,} vectors. Stopping.")
-            break
-
-        print(f"[{i+1}/{len(batch_files)}] Processing {filepath.name}")
-
-        success, errors = ingest_batch(index, filepath)
-        total_success += success
-        total_errors += errors
-
-        # Mark batch as complete
-        mark_batch_complete(filepath.name)
-        print(f"  -> {success:,} docs indexed, {errors} errors")
+    completed_count = 0
+    progress_file = open_progress_file()
+
+    # Upserts are network-bound, so keep several batch files in flight at once
+    remaining = iter(enumerate(batch_files))
+    in_flight = {}
+    in_flight_vectors = 0
+
+    with ThreadPoolExecutor(max_workers=INGEST_WORKERS) as executor:
+        while True:
+            while len(in_flight) < INGEST_WORKERS:
+                # Check if we've reached the limit, counting files still in flight
+                if current_count + total_success + in_flight_vectors >= MAX_VECTORS:
+                    break
+
+                next_batch = next(remaining, None)
+                if next_batch is None:
+                    break
+
+                i, filepath = next_batch
+                vector_count = count_vectors(filepath)
+                in_flight_vectors += vector_count
+                print(f"[{i+1}/{len(batch_files)}] Processing {filepath.name}")
+                in_flight[executor.submit(ingest_batch, index, filepath)] = (filepath, vector_count)
+
+            if not in_flight:
+                break
+
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                filepath, vector_count = in_flight.pop(future)
+                in_flight_vectors -= vector_count
+                success, errors = future.result()
+                total_success += success
+                total_errors += errors
+
+                # Mark batch as complete
+                completed_count += 1
+                mark_batch_complete(progress_file, done, batch_index(filepath.name), completed_count)
+                print(f"  -> {filepath.name}: {success:,} docs indexed, {errors} errors")
+
+    progress_file.close()
+
+    if current_count + total_success >= MAX_VECTORS:
+        print(f"\nReached limit of {MAX_VECTORS:,} vectors. Stopping.")
 
     print(f"\nIngestion complete: {total_success:,} vectors indexed")
     if total_errors: